@@ -1,8 +1,16 @@
 import socket
 import random
 import os
+import stat
+import sys
 import time
+import struct
 import threading
+import ctypes
+import mmap
+import select
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import scrolledtext, messagebox
 
@@ -16,55 +24,469 @@ PORT = 9999
 BUFFER_SIZE = 10000
 
 
-def handle_request(server_socket, data, addr):
-    """Handle incoming file request from one client."""
-    filename = data.decode().strip()
-    print(f"Client {addr} requested: {filename}")
+CHUNK_MIN = 1000                  # datagram payload sizes are drawn at random
+CHUNK_MAX = 2000                  # from [CHUNK_MIN, CHUNK_MAX], as ques.txt requires
+SEND_BATCH = 64                   # datagrams handed to the kernel per sendmmsg call
+STREAM_RATE = 2 * 1024 * 1024     # target send rate in bytes/second
+SOCKET_BUFFER = 8 * 1024 * 1024   # SO_SNDBUF / SO_RCVBUF request
+ACK_TIMEOUT = 1.0                 # how long to wait for the client's ACK before streaming
+MAX_WORKERS = 32                  # concurrent streams served at once
+
+# Clients waiting to ACK the "OK" reply: addr -> threading.Event
+pending_acks = {}
+
+# Reused worker threads for handle_request (shared by all receive loops)
+request_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+
+# ---------- reusable packet buffers ----------
+
+class BufferPool:
+    """Fixed ring of preallocated bytearrays reused across packets."""
+
+    def __init__(self, count=128, size=2048):
+        self.size = size
+        self._free = deque(bytearray(size) for _ in range(count))
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                return self._free.popleft()
+        # Pool exhausted: hand out a fresh buffer rather than block
+        return bytearray(self.size)
 
-    if os.path.exists(filename):
-        server_socket.sendto(b"OK", addr)
-        time.sleep(0.1)
+    def release(self, buf):
+        with self._lock:
+            self._free.append(buf)
+
+
+# ---------- sendmmsg(2) / recvmmsg(2) via ctypes (Linux only) ----------
 
-        with open(filename, "rb") as f:
-            while True:
-                chunk_size = random.randint(1000, 2000)
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p),
+                ("iov_len", ctypes.c_size_t)]
 
-                server_socket.sendto(chunk, addr)
-                print(f"Sent {len(chunk)} bytes to {addr}")
-                time.sleep(0.05)
 
-        server_socket.sendto(b"EOF", addr)
-        print(f"Streaming complete for {filename}")
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [("msg_name", ctypes.c_void_p),
+                ("msg_namelen", ctypes.c_uint32),
+                ("msg_iov", ctypes.POINTER(_IOVec)),
+                ("msg_iovlen", ctypes.c_size_t),
+                ("msg_control", ctypes.c_void_p),
+                ("msg_controllen", ctypes.c_size_t),
+                ("msg_flags", ctypes.c_int)]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr),
+                ("msg_len", ctypes.c_uint)]
+
+
+_libc = None
+if sys.platform.startswith("linux"):
+    try:
+        _libc = ctypes.CDLL("libc.so.6", use_errno=True)
+        _libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                                   ctypes.c_uint, ctypes.c_int]
+        _libc.sendmmsg.restype = ctypes.c_int
+        _libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p,
+                                   ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+        _libc.recvmmsg.restype = ctypes.c_int
+    except (OSError, AttributeError):
+        _libc = None
+
+
+def _sockaddr_in(addr):
+    """Pack an (ip, port) tuple into a C struct sockaddr_in."""
+    ip, port = addr
+    return (struct.pack("=H", socket.AF_INET) + struct.pack("!H", port)
+            + socket.inet_aton(ip) + bytes(8))
+
+
+def send_batch(sock, buf, chunks, addr):
+    """Send the (offset, length) slices of buf to addr as separate datagrams.
+
+    Uses one sendmmsg call for the whole batch on Linux and falls back to a
+    plain sendto loop everywhere else.
+    """
+    if _libc is None:
+        view = memoryview(buf)
+        for offset, length in chunks:
+            sock.sendto(view[offset:offset + length], addr)
+        return
+
+    count = len(chunks)
+    raw_name = _sockaddr_in(addr)
+    name = ctypes.create_string_buffer(raw_name, len(raw_name))
+    iovecs = (_IOVec * count)()
+    msgs = (_MMsgHdr * count)()
+    c_buf = (ctypes.c_char * len(buf)).from_buffer(buf)
+    base = ctypes.addressof(c_buf)
+
+    for i, (offset, length) in enumerate(chunks):
+        iovecs[i].iov_base = base + offset
+        iovecs[i].iov_len = length
+        hdr = msgs[i].msg_hdr
+        hdr.msg_name = ctypes.addressof(name)
+        hdr.msg_namelen = len(raw_name)
+        hdr.msg_iov = ctypes.pointer(iovecs[i])
+        hdr.msg_iovlen = 1
+
+    sent = 0
+    while sent < count:
+        n = _libc.sendmmsg(sock.fileno(),
+                           ctypes.addressof(msgs) + sent * ctypes.sizeof(_MMsgHdr),
+                           count - sent, 0)
+        if n < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        sent += n
+
+
+# ---------- UDP generic segmentation offload (Linux 4.18+) ----------
+
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103)
+UDP_MAX_SEGMENTS = 64             # kernel limit on datagrams per GSO send
+GSO_MAX_BYTES = 65000             # GSO payload per send must stay < 64 KB
+
+# Turned off the first time the kernel rejects a GSO send
+gso_enabled = sys.platform.startswith("linux") and hasattr(socket.socket, "sendmsg")
+
+
+# ---------- MSG_ZEROCOPY for large sends (Linux 5.0+ for UDP) ----------
+
+SO_ZEROCOPY = getattr(socket, "SO_ZEROCOPY", 60)
+MSG_ZEROCOPY = getattr(socket, "MSG_ZEROCOPY", 0x4000000)
+MSG_ERRQUEUE = getattr(socket, "MSG_ERRQUEUE", 0x2000)
+SO_EE_ORIGIN_ZEROCOPY = 5
+ZEROCOPY_THRESHOLD = 4096         # smaller sends are cheaper to copy
+ZEROCOPY_WAIT = 1.0               # longest wait for completions before unmapping
+
+# Server socket fileno -> ZeroCopyTracker, for sockets that accepted SO_ZEROCOPY
+zerocopy_trackers = {}
+
+
+class ZeroCopyTracker:
+    """Keeps MSG_ZEROCOPY buffers alive until the kernel reports completion.
+
+    The kernel numbers zerocopy sends on a socket 0, 1, 2, ... and later
+    posts [lo, hi] completion ranges on the socket error queue.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._inflight = {}
+
+    def send(self, sock, view, ancdata, addr, owner):
+        with self._lock:
+            self._drain(sock)
+            try:
+                sock.sendmsg([view], ancdata, MSG_ZEROCOPY, addr)
+            except OSError:
+                # e.g. ENOBUFS when too many sends are pinned: copy instead
+                sock.sendmsg([view], ancdata, 0, addr)
+                return
+            self._inflight[self._next_id] = owner
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+
+    def release(self, sock, owner, timeout=ZEROCOPY_WAIT):
+        """Wait until the kernel has completed every zerocopy send of owner.
+
+        After timeout the sends are forgotten anyway; the kernel keeps the
+        pages it still needs pinned, so unmapping owner is then still safe.
+        """
+        poller = select.poll()
+        poller.register(sock, 0)  # POLLERR (error queue readable) is implied
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._drain(sock)
+                ids = [i for i, o in self._inflight.items() if o is owner]
+                if not ids or time.monotonic() >= deadline:
+                    for i in ids:
+                        del self._inflight[i]
+                    return
+            # Short waits: another stream may drain our completions first
+            poller.poll(10)
+
+    def _drain(self, sock):
+        while True:
+            try:
+                _, ancdata, _, _ = sock.recvmsg(0, 256, MSG_ERRQUEUE | MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return
+            for _, _, data in ancdata:
+                if len(data) < 16:
+                    continue
+                _, origin, _, _, _, lo, hi = struct.unpack("=IBBBBII", data[:16])
+                if origin != SO_EE_ORIGIN_ZEROCOPY:
+                    continue
+                for i in range((hi - lo) % 0x100000000 + 1):
+                    self._inflight.pop((lo + i) & 0xFFFFFFFF, None)
+
+
+def send_chunks(sock, buf, chunks, addr):
+    """Send consecutive chunks of buf in order, using UDP GSO where it fits.
+
+    With UDP_SEGMENT the kernel splits one buffer into equal-sized datagrams
+    itself (only the last may be shorter), so such a run costs one syscall
+    and one pass through the UDP stack. Chunk sizes are random, so runs are
+    short; every chunk outside a run goes through send_batch (sendmmsg).
+    """
+    pending = []
+    i = 0
+    while i < len(chunks):
+        seg = chunks[i][1]
+        limit = min(len(chunks), i + UDP_MAX_SEGMENTS, i + GSO_MAX_BYTES // seg)
+        j = i + 1
+        while j < limit and chunks[j][1] == seg:
+            j += 1
+        if j < limit and chunks[j][1] < seg:
+            j += 1  # a shorter datagram can still close the run
+        if j - i > 1 and gso_enabled:
+            if pending:
+                send_batch(sock, buf, pending, addr)
+                pending = []
+            if send_gso(sock, buf, chunks[i:j], seg, addr):
+                i = j
+                continue
+        pending.extend(chunks[i:j])
+        i = j
+    if pending:
+        send_batch(sock, buf, pending, addr)
+
+
+def send_gso(sock, buf, run, seg, addr):
+    """Send a run of consecutive chunks as one GSO sendmsg of seg-byte datagrams.
+
+    Returns False, and turns GSO off, if the kernel rejects it.
+    """
+    global gso_enabled
+    first = run[0][0]
+    last = run[-1][0] + run[-1][1]
+    view = memoryview(buf)[first:last]
+    ancdata = [(socket.IPPROTO_UDP, UDP_SEGMENT, struct.pack("=H", seg))]
+    tracker = zerocopy_trackers.get(sock.fileno())
+    try:
+        if tracker and len(view) >= ZEROCOPY_THRESHOLD:
+            tracker.send(sock, view, ancdata, addr, buf)
+        else:
+            sock.sendmsg([view], ancdata, 0, addr)
+        return True
+    except OSError as e:
+        print(f"UDP GSO unavailable ({e}), using sendmmsg")
+        gso_enabled = False
+        return False
+
+
+O_NOATIME = getattr(os, "O_NOATIME", 0)
+
+
+def open_for_streaming(filename):
+    """Open a regular file read-only without updating its access time.
+
+    Returns a binary file object wrapping the O_NOATIME descriptor.
+
+    Raises OSError if the file is missing or is not a regular file, so the
+    caller needs no separate os.path.exists() check.
+    """
+    try:
+        fd = os.open(filename, os.O_RDONLY | O_NOATIME)
+    except PermissionError:
+        # O_NOATIME is only allowed on files we own
+        fd = os.open(filename, os.O_RDONLY)
+
+    # Until the file object owns the descriptor, close it on any failure
+    try:
+        if not stat.S_ISREG(os.fstat(fd).st_mode):
+            raise IsADirectoryError(filename)
+
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        return os.fdopen(fd, "rb")
+    except BaseException:
+        os.close(fd)
+        raise
 
-    else:
+
+def handle_request(server_socket, data, addr):
+    """Handle incoming file request from one client."""
+    filename = data.decode().strip()
+    print(f"Client {addr} requested: {filename}")
+
+    try:
+        f = open_for_streaming(filename)
+    except OSError:
         server_socket.sendto(b"ERROR", addr)
         print(f"File not found: {filename}")
+        return
 
+    with f:
+        ready = threading.Event()
+        pending_acks[addr] = ready
+        server_socket.sendto(b"OK", addr)
+        ready.wait(ACK_TIMEOUT)
+        pending_acks.pop(addr, None)
+
+        # Map the file once and cut it into randomly sized chunks; the
+        # sends below slice this mapping without copying it. ACCESS_COPY
+        # keeps it writable for ctypes while never touching the file.
+        fd = f.fileno()
+        size = os.fstat(fd).st_size
+        buf = mmap.mmap(fd, 0, access=mmap.ACCESS_COPY) if size else bytearray()
+
+        chunks = []
+        offset = 0
+        while offset < len(buf):
+            length = min(random.randint(CHUNK_MIN, CHUNK_MAX), len(buf) - offset)
+            chunks.append((offset, length))
+            offset += length
 
-def start_server():
+        try:
+            # Token bucket: only sleep when we are ahead of STREAM_RATE
+            start = time.monotonic()
+            bytes_sent = 0
+            for i in range(0, len(chunks), SEND_BATCH):
+                batch = chunks[i:i + SEND_BATCH]
+                send_chunks(server_socket, buf, batch, addr)
+                batch_bytes = sum(n for _, n in batch)
+                bytes_sent += batch_bytes
+                print(f"Sent {batch_bytes} bytes ({len(batch)} packets) to {addr}")
+
+                delay = start + bytes_sent / STREAM_RATE - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+        finally:
+            # Zerocopy sends may still be reading the mapping; wait for
+            # them, then unmap it before dropping the file's pages from the
+            # cache, since the kernel will not drop pages that are mapped
+            tracker = zerocopy_trackers.get(server_socket.fileno())
+            if tracker:
+                tracker.release(server_socket, buf)
+            if size:
+                try:
+                    buf.close()
+                except BufferError:
+                    pass  # a send that failed still holds a view of it
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+    server_socket.sendto(b"EOF", addr)
+    print(f"Streaming complete for {filename}")
+
+
+def create_server_socket():
+    """Create a UDP server socket with large kernel buffers."""
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER)
+    server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER)
+    if hasattr(socket, "SO_REUSEPORT"):
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     server_socket.bind((HOST, PORT))
+    if gso_enabled:
+        try:
+            server_socket.setsockopt(socket.SOL_SOCKET, SO_ZEROCOPY, 1)
+            zerocopy_trackers[server_socket.fileno()] = ZeroCopyTracker()
+        except OSError:
+            pass
+    return server_socket
+
+
+def report_error(future):
+    """Print errors from pooled handlers, which the executor would hide."""
+    error = future.exception()
+    if error is not None:
+        print(f"Error while streaming: {error}")
 
-    print(f"🚀 UDP Streaming Server running on {HOST}:{PORT}")
+
+def serve(server_socket):
+    """Receive loop: dispatch file requests and wake handlers on ACK."""
+    # Only this loop reads from the socket, so one buffer is enough
+    recv_buf = bytearray(2048)
+    recv_view = memoryview(recv_buf)
 
     while True:
-        data, addr = server_socket.recvfrom(2048)
+        nbytes, addr = server_socket.recvfrom_into(recv_buf)
+        data = recv_view[:nbytes]
 
-        thread = threading.Thread(
-            target=handle_request,
-            args=(server_socket, data, addr),
-            daemon=True
-        )
-        thread.start()
+        if data == b"ACK":
+            ready = pending_acks.get(addr)
+            if ready:
+                ready.set()
+            continue
+
+        future = request_pool.submit(handle_request, server_socket, bytes(data), addr)
+        future.add_done_callback(report_error)
+
+
+def start_server():
+    # With SO_REUSEPORT the kernel spreads clients across one socket per CPU
+    workers = (os.cpu_count() or 1) if hasattr(socket, "SO_REUSEPORT") else 1
+    sockets = [create_server_socket() for _ in range(workers)]
+
+    print(f"🚀 UDP Streaming Server running on {HOST}:{PORT} ({workers} receiver(s))")
+
+    for server_socket in sockets[1:]:
+        threading.Thread(target=serve, args=(server_socket,), daemon=True).start()
+    serve(sockets[0])
 
 
 # -------------------------------------------------
 #                GUI CLIENT CODE
 # -------------------------------------------------
 
+RECV_BATCH = 64
+PROGRESS_INTERVAL_MS = 500   # how often the "Received" line is refreshed
+MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0x40)
+RECV_POOL = BufferPool(count=2 * RECV_BATCH, size=2048)
+
+
+def recvmmsg_batch(sock, n=RECV_BATCH, pool=RECV_POOL):
+    """Receive up to n datagrams with a single recvmmsg call.
+
+    Blocks (honouring the socket timeout) until at least one datagram is
+    ready, then drains whatever else is already queued. Returns a list of
+    (nbytes, buf) pairs in arrival order; each buf comes from pool and must
+    be released back to it once the caller is done with it.
+    """
+    if _libc is None:
+        buf = pool.acquire()
+        try:
+            return [(sock.recv_into(buf), buf)]
+        except BaseException:
+            pool.release(buf)
+            raise
+
+    # A Python socket with a timeout is non-blocking at the fd level, so
+    # wait for readability here and let recvmmsg just drain the queue.
+    ready, _, _ = select.select([sock], [], [], sock.gettimeout())
+    if not ready:
+        raise socket.timeout("timed out")
+
+    bufs = [pool.acquire() for _ in range(n)]
+    iovecs = (_IOVec * n)()
+    msgs = (_MMsgHdr * n)()
+    for i, buf in enumerate(bufs):
+        iovecs[i].iov_base = ctypes.addressof((ctypes.c_char * len(buf)).from_buffer(buf))
+        iovecs[i].iov_len = len(buf)
+        msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+        msgs[i].msg_hdr.msg_iovlen = 1
+
+    count = _libc.recvmmsg(sock.fileno(), ctypes.addressof(msgs), n, MSG_DONTWAIT, None)
+    if count < 0:
+        err = ctypes.get_errno()
+        for buf in bufs:
+            pool.release(buf)
+        raise OSError(err, os.strerror(err))
+
+    # Return the slots that did not receive anything straight to the pool
+    for buf in bufs[count:]:
+        pool.release(buf)
+    return [(msgs[i].msg_len, bufs[i]) for i in range(count)]
+
+
 class UDPStreamingClient:
     def __init__(self, master):
         self.master = master
@@ -105,6 +527,8 @@ class UDPStreamingClient:
         self.output_file = None
         self.player_launched = False
         self.bytes_received = 0
+        self.bytes_shown = 0
+        self.progress_pending = False
 
         self.add_log("System: Enter the multimedia filename (e.g., 18.mp4).", "yellow")
 
@@ -115,6 +539,18 @@ class UDPStreamingClient:
         self.log_area.yview(tk.END)
         self.log_area.config(state=tk.DISABLED)
 
+    def schedule_progress(self):
+        """Coalesce per-packet progress into one log line per interval."""
+        if not self.progress_pending:
+            self.progress_pending = True
+            self.master.after(PROGRESS_INTERVAL_MS, self.show_progress)
+
+    def show_progress(self):
+        self.progress_pending = False
+        if self.bytes_received != self.bytes_shown:
+            self.bytes_shown = self.bytes_received
+            self.add_log(f"Received: {self.bytes_received} bytes", "lightblue")
+
     def send_request(self, event=None):
         filename = self.input_text.get().strip()
         if not filename:
@@ -124,11 +560,12 @@ class UDPStreamingClient:
 
         self.output_file = f"streaming_{filename}"
         self.bytes_received = 0
+        self.bytes_shown = 0
         self.player_launched = False
 
         try:
             self.client.sendto(filename.encode(), ("127.0.0.1", PORT))
-        except:
+        except OSError:
             self.add_log("Error: Cannot send request!", "red")
             return
 
@@ -145,24 +582,37 @@ class UDPStreamingClient:
                 self.add_log("Error: File not found on server!", "red")
                 return
 
+            # Tell the server we are ready so it can start streaming
+            self.client.sendto(b"ACK", ("127.0.0.1", PORT))
+
             self.add_log("Streaming started...", "yellow")
 
             with open(self.output_file, "wb") as f:
-                while True:
+                done = False
+                while not done:
                     try:
-                        data, _ = self.client.recvfrom(2048)
+                        batch = recvmmsg_batch(self.client)
+                    except socket.timeout:
+                        self.show_progress()
+                        self.add_log("Stream timeout!", "red")
+                        break
+
+                    for nbytes, buf in batch:
+                        data = memoryview(buf)[:nbytes]
 
                         if data == b"EOF":
+                            self.show_progress()
                             self.add_log("Streaming complete!", "yellow")
+                            done = True
                             break
 
                         f.write(data)
-                        f.flush()
-                        self.bytes_received += len(data)
-
-                        self.add_log(f"Received: {self.bytes_received} bytes", "lightblue")
+                        self.bytes_received += nbytes
+                        self.schedule_progress()
 
                         if self.bytes_received >= BUFFER_SIZE and not self.player_launched:
+                            # Make sure the player sees the buffered bytes on disk
+                            f.flush()
                             self.player_launched = True
                             self.add_log(
                                 f"\nBuffer reached {BUFFER_SIZE} bytes. You can now play:",
@@ -170,9 +620,9 @@ class UDPStreamingClient:
                             )
                             self.add_log(self.output_file, "lightgreen")
 
-                    except socket.timeout:
-                        self.add_log("Stream timeout!", "red")
-                        break
+                    # Hand every slot of this batch back for the next receive
+                    for _, buf in batch:
+                        RECV_POOL.release(buf)
 
         except Exception as e:
             self.add_log(f"Error: {str(e)}", "red")
@@ -3,6 +3,8 @@ import socket
 HOST = 'localhost'
 PORT = 2121
 FILENAME = 'ques.txt'
+ACK = b'ACK'
+RECV_BUF = bytearray(1024)
 
 #TCP Server Code
 def tcp_server():
@@ -14,12 +16,13 @@ def tcp_server():
         conn,addr=server_socket.accept()
         with conn:
             print(f"Connected by {addr}")
+            view=memoryview(RECV_BUF)
             while True:
-                data=conn.recv(1024)
-                if not data:
+                n=conn.recv_into(RECV_BUF)
+                if not n:
                     break
-                print(f"Received: {data.decode()}")
-                conn.sendall(b'ACK') #Send acknowledgment
+                print(f"Received: {str(view[:n], 'utf-8', 'replace')}")
+            conn.sendall(ACK) #Send one acknowledgment for the whole file
     print("TCP Server closed.")
     
 #TCP Client Code
@@ -28,11 +31,11 @@ def tcp_client():
         client_socket.connect((HOST,PORT))
         print("TCP Client connected to server.")
         
-        with open(FILENAME,'r') as file:
-            for line in file:
-                client_socket.sendall(line.encode())
-                data=client_socket.recv(1024)
-                print(f"Server acknowledgment: {data.decode()}")
+        with open(FILENAME,'rb') as file:
+            client_socket.sendfile(file) #Kernel copies the file straight to the socket
+        client_socket.shutdown(socket.SHUT_WR) #Tell the server the file is done
+        data=client_socket.recv(1024)
+        print(f"Server acknowledgment: {data.decode()}")
     print("TCP Client closed.")
     
 
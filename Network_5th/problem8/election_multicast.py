@@ -5,18 +5,37 @@ import threading
 GROUP = "224.1.1.1"
 PORT = 5007
 TOTAL = 5
+# Keep multicast loopback on: electorates running on the same machine only
+# hear each other through it. Our own echo is dropped by record_vote.
+MULTICAST_LOOP = 1
 
 votes = {}
+votes_arr = bytearray()  # one byte (b"A"/b"B") per recorded vote, for C-level counting
+votes_lock = threading.Lock()
+all_votes_in = threading.Event()
+
+def record_vote(user, vote):
+    """Store a vote once per user; returns False for duplicates and invalid votes."""
+    if vote not in ("A", "B"):
+        return False
+    with votes_lock:
+        if user in votes:
+            return False
+        votes[user] = vote
+        votes_arr.append(vote.encode()[0])
+        if len(votes) >= TOTAL:
+            all_votes_in.set()
+        return True
 
 def receiver(sock):
-    global votes
-    while len(votes) < TOTAL:
-        data, _ = sock.recvfrom(1024)
-        msg = data.decode().strip()
+    buf = bytearray(1024)
+    view = memoryview(buf)
+    while not all_votes_in.is_set():
+        n = sock.recv_into(buf)
+        msg = str(view[:n], "utf-8", "replace").strip()
         if ":" in msg:
             user, vote = msg.split(":")
-            if user not in votes:
-                votes[user] = vote
+            if record_vote(user, vote):
                 print(f"📥 Received vote from {user}: {vote}")
 
 def main():
@@ -39,6 +58,7 @@ def main():
     # Join multicast group
     mreq = struct.pack("4s4s", socket.inet_aton(GROUP), socket.inet_aton("0.0.0.0"))
     sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, MULTICAST_LOOP)
 
     # Receiver thread
     t = threading.Thread(target=receiver, args=(sock,))
@@ -50,15 +70,21 @@ def main():
     sock.sendto(message, (GROUP, PORT))
     print(f"📤 Sent vote: {vote}")
 
+    # Count our own vote directly instead of waiting for the multicast echo
+    record_vote(name, vote)
+
     # Wait for 5 votes
-    while len(votes) < TOTAL:
-        pass
+    all_votes_in.wait()
+
+    with votes_lock:
+        results = dict(votes)
+        ballots = bytes(votes_arr)
 
     print("\n==================== RESULTS ====================")
-    print(votes)
+    print(results)
 
-    A = list(votes.values()).count("A")
-    B = list(votes.values()).count("B")
+    A = ballots.count(b"A")
+    B = ballots.count(b"B")
 
     print(f"Votes for A = {A}")
     print(f"Votes for B = {B}")
@@ -1,41 +1,65 @@
 """
 Configuration settings for SMTP Lab project.
+
+Settings are frozen dataclasses, so they are read as attributes
+(e.g. SERVER_CONFIG.port) and cannot be changed by importers at runtime.
 """
 
+import sys
+from dataclasses import dataclass
+
+# slots=True needs Python 3.10+; older versions still get frozen dataclasses
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Sentinel for "no domain restriction"; compare with `is ALLOW_ANY`
+ALLOW_ANY = object()
+
+
 # Server Configuration
-SERVER_CONFIG = {
-    'host': '127.0.0.1',      # localhost
-    'port': 1025,              # Non-privileged port
-    'mailbox_dir': 'mailboxes' # Directory to store mailboxes
-}
+@dataclass(frozen=True, **_SLOTS)
+class ServerConfig:
+    host: str = '127.0.0.1'      # localhost
+    port: int = 1025              # Non-privileged port
+    mailbox_dir: str = 'mailboxes'  # Directory to store mailboxes
+
 
 # Client Configuration
-CLIENT_CONFIG = {
-    'default_server_host': '127.0.0.1',
-    'default_server_port': 1025,
-    'timeout': 30  # Connection timeout in seconds
-}
+@dataclass(frozen=True, **_SLOTS)
+class ClientConfig:
+    default_server_host: str = '127.0.0.1'
+    default_server_port: int = 1025
+    timeout: int = 30  # Connection timeout in seconds
+
 
 # Logging Configuration
-LOGGING_CONFIG = {
-    'level': 'INFO',
-    'server_log_file': 'smtp_server.log',
-    'client_log_file': 'smtp_client.log',
-    'format': '%(asctime)s - %(levelname)s - %(message)s'
-}
+@dataclass(frozen=True, **_SLOTS)
+class LoggingConfig:
+    level: str = 'INFO'
+    server_log_file: str = 'smtp_server.log'
+    client_log_file: str = 'smtp_client.log'
+    format: str = '%(asctime)s - %(levelname)s - %(message)s'
+
 
 # Email Validation Rules
-EMAIL_VALIDATION = {
-    'max_subject_length': 200,
-    'max_body_length': 10000,
-    'max_recipients': 50,
-    'allowed_domains': None  # None = allow all domains, or provide list of allowed domains
-}
+@dataclass(frozen=True, **_SLOTS)
+class EmailValidationConfig:
+    max_subject_length: int = 200
+    max_body_length: int = 10000
+    max_recipients: int = 50
+    allowed_domains: object = ALLOW_ANY  # ALLOW_ANY, or a frozenset of lowercase domains
+
 
 # Attachment Configuration (Optional Feature)
-ATTACHMENT_CONFIG = {
-    'enabled': True,
-    'max_file_size_mb': 10,
-    'max_attachments': 5,
-    'allowed_extensions': ['.txt', '.pdf', '.doc', '.docx', '.jpg', '.png', '.zip']
-}
+@dataclass(frozen=True, **_SLOTS)
+class AttachmentConfig:
+    enabled: bool = True
+    max_file_size_mb: int = 10
+    max_attachments: int = 5
+    allowed_extensions: frozenset = frozenset({'.txt', '.pdf', '.doc', '.docx', '.jpg', '.png', '.zip'})
+
+
+SERVER_CONFIG = ServerConfig()
+CLIENT_CONFIG = ClientConfig()
+LOGGING_CONFIG = LoggingConfig()
+EMAIL_VALIDATION = EmailValidationConfig()
+ATTACHMENT_CONFIG = AttachmentConfig()
@@ -0,0 +1,158 @@
+"""
+Mailbox Index
+Each mailbox keeps one append-only index.jsonl file with one line of JSON
+metadata per delivered email, so listing a mailbox is a single read.
+"""
+
+import os
+import json
+import threading
+
+# orjson parses JSON several times faster; fall back to the stdlib if absent
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+INDEX_FILE = 'index.jsonl'
+
+# Mailbox paths already checked for legacy metadata, so each delivery does
+# not repeat the check; the lock keeps concurrent deliveries from appending
+# while a migration is still writing the index
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def append_to_index(mailbox_path, metadata):
+    """
+    Record one delivered email in the mailbox index.
+
+    Args:
+        mailbox_path: Path to the recipient's mailbox directory
+        metadata: Metadata dict for the email
+    """
+    if mailbox_path not in _migrated:
+        with _migrate_lock:
+            if mailbox_path not in _migrated:
+                migrate_metadata_files(mailbox_path)
+                _migrated.add(mailbox_path)
+    line = json.dumps(metadata) + '\n'
+    with open(os.path.join(mailbox_path, INDEX_FILE), 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+def read_index(mailbox_path, offset=0):
+    """
+    Read index records from a byte offset onwards.
+
+    A mailbox from before the index has no index.jsonl yet; its legacy
+    metadata_*.json files are read instead, without changing the mailbox.
+
+    Args:
+        mailbox_path: Path to the mailbox directory
+        offset: Byte offset to start from (a previous call's return value)
+
+    Returns:
+        tuple: (list of metadata dicts in delivery order,
+                offset just past the last complete line)
+    """
+    index_path = os.path.join(mailbox_path, INDEX_FILE)
+    if not offset and not os.path.exists(index_path):
+        return _read_metadata_files(mailbox_path), 0
+    return read_jsonl(index_path, offset)
+
+
+def find_unindexed(mailbox_path, records):
+    """
+    List the .eml files that no index record names.
+
+    Args:
+        mailbox_path: Path to the mailbox directory
+        records: Metadata dicts read from the mailbox index
+
+    Returns:
+        list: Sorted .eml filenames missing from records
+    """
+    indexed = {record.get('filename') for record in records}
+    try:
+        with os.scandir(mailbox_path) as it:
+            return sorted(entry.name for entry in it
+                          if entry.name.endswith('.eml')
+                          and entry.name not in indexed and entry.is_file())
+    except FileNotFoundError:
+        return []
+
+
+def read_jsonl(path, offset=0):
+    """
+    Read JSON Lines records from a byte offset onwards.
+
+    Args:
+        path: Path to the .jsonl file
+        offset: Byte offset to start from (a previous call's return value)
+
+    Returns:
+        tuple: (list of records, offset just past the last complete line);
+               ([], 0) if the file does not exist
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0
+
+    # A line still being appended has no newline yet; leave it for next time
+    end = data.rfind(b'\n') + 1
+    records = []
+    for line in data[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            records.append(json_loads(line))
+        except ValueError:
+            # Skip a damaged line rather than lose the whole file
+            continue
+    return records, offset + end
+
+
+def migrate_metadata_files(mailbox_path):
+    """
+    Build the index from legacy metadata_*.json files.
+
+    Only runs while the mailbox has no index yet; the legacy files are left
+    in place, and the new index keeps this from running again.
+
+    Args:
+        mailbox_path: Path to the mailbox directory
+    """
+    index_path = os.path.join(mailbox_path, INDEX_FILE)
+    if os.path.exists(index_path):
+        return
+
+    records = _read_metadata_files(mailbox_path)
+    if not records:
+        return
+
+    # Write it aside and move it into place, so no reader or append ever
+    # sees a half-written index
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(''.join(json.dumps(record) + '\n' for record in records))
+    os.replace(tmp_path, index_path)
+
+
+def _read_metadata_files(mailbox_path):
+    """Read legacy metadata_*.json files in delivery order"""
+    try:
+        # Filenames embed the delivery timestamp, so this is delivery order
+        names = sorted(name for name in os.listdir(mailbox_path)
+                       if name.startswith('metadata_') and name.endswith('.json'))
+    except FileNotFoundError:
+        return []
+
+    records = []
+    for name in names:
+        with open(os.path.join(mailbox_path, name), 'rb') as f:
+            records.append(json_loads(f.read()))
+    return records
@@ -8,11 +8,13 @@ import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email import encoders
+from base64 import encodebytes
 from datetime import datetime
+import mmap
 import os
 import socket
 import json
+import threading
 
 # Setup logging
 logging.basicConfig(
@@ -50,6 +52,11 @@ class SMTPClient:
     SMTP Client for composing and sending emails.
     """
     
+    # Idle connections shared by all clients, keyed by (host, port), so
+    # repeated sends skip the TCP connect and EHLO round trips
+    _idle_connections = {}
+    _idle_lock = threading.Lock()
+    
     def __init__(self, server_host='127.0.0.1', server_port=1025):
         """
         Initialize SMTP Client.
@@ -91,6 +98,55 @@ class SMTPClient:
         except Exception as e:
             logging.error(f"Failed to save delivery failure: {e}")
     
+    def _get_connection(self):
+        """
+        Take an idle connection to the server, or open a new one.
+        
+        Returns:
+            smtplib.SMTP: Connection owned by the caller until released
+        """
+        key = (self.server_host, self.server_port)
+        with self._idle_lock:
+            server = self._idle_connections.pop(key, None)
+        
+        if server is not None:
+            # RSET clears any leftover transaction and proves the link is alive
+            try:
+                if server.rset()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            server.close()
+        
+        server = smtplib.SMTP(self.server_host, self.server_port, timeout=10)
+        server.set_debuglevel(0)  # Set to 1 for debug output
+        return server
+    
+    def _release_connection(self, server):
+        """Return a healthy connection to the idle pool."""
+        key = (self.server_host, self.server_port)
+        with self._idle_lock:
+            if key not in self._idle_connections:
+                self._idle_connections[key] = server
+                return
+        # One idle connection per server is enough
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+    
+    @classmethod
+    def close_connections(cls):
+        """Send QUIT on every idle pooled connection."""
+        with cls._idle_lock:
+            servers = list(cls._idle_connections.values())
+            cls._idle_connections.clear()
+        for server in servers:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+    
     def create_email(self, sender, recipients, subject, body, attachments=None):
         """
         Create an email message.
@@ -140,11 +196,18 @@ class SMTPClient:
             file_path: Path to the file to attach
         """
         try:
+            # Base64-encode straight from a read-only mapping so the raw file
+            # is never copied onto the heap; only the encoded text is kept
             with open(file_path, 'rb') as f:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(f.read())
+                if os.fstat(f.fileno()).st_size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        encdata = str(encodebytes(mm), 'ascii')
+                else:
+                    encdata = ''  # mmap cannot map an empty file
             
-            encoders.encode_base64(part)
+            part = MIMEBase('application', 'octet-stream')
+            part.set_payload(encdata)
+            part['Content-Transfer-Encoding'] = 'base64'
             filename = os.path.basename(file_path)
             part.add_header('Content-Disposition', f'attachment; filename={filename}')
             msg.attach(part)
@@ -191,9 +254,13 @@ class SMTPClient:
             # Connect to SMTP server and send email
             logging.info(f"Connecting to SMTP server at {self.server_host}:{self.server_port}")
             
-            with smtplib.SMTP(self.server_host, self.server_port, timeout=10) as server:
-                server.set_debuglevel(0)  # Set to 1 for debug output
+            server = self._get_connection()
+            try:
                 server.sendmail(sender, recipients, msg.as_string())
+            except BaseException:
+                server.close()
+                raise
+            self._release_connection(server)
             
             logging.info(f"Email sent successfully to {recipients}")
             print(f"\n✓ Email sent successfully!")
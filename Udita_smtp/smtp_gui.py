@@ -8,13 +8,115 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
 import threading
 import queue
+from concurrent.futures import ThreadPoolExecutor
 import json
 import os
 from datetime import datetime
+from operator import itemgetter
+from email.parser import BytesParser
+from email import policy
+
+# orjson parses JSON several times faster; fall back to the stdlib if absent
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+# ijson parses large failure logs item by item instead of reading the whole
+# file into memory first; without it every file is loaded in one go
+try:
+    import ijson
+except ImportError:
+    ijson = None
+# watchdog reloads the mailbox view when mail arrives; without it the
+# GUI falls back to refreshing once after each send
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
 from smtp_client import SMTPClient
 from smtp_server import CustomSMTPHandler, logging
+from mailbox_index import INDEX_FILE, find_unindexed, read_index, read_jsonl
 from aiosmtpd.controller import Controller
-import time
+
+
+# Server log drains take at most this many messages per pass, and the log
+# widget keeps only the newest LOG_MAX_LINES lines
+LOG_DRAIN_BATCH = 200
+LOG_MAX_LINES = 5000
+
+# JSON failure logs at least this large are streamed with ijson
+STREAM_JSON_BYTES = 8 << 20
+
+# Foreground colors for the tags log_message applies
+LOG_COLORS = {
+    'blue': '#0066cc',
+    'green': '#008000',
+    'red': '#cc0000'
+}
+
+
+# Rule between the header block and the body in the email view
+HEADER_SEPARATOR = "\n" + "-"*60 + "\n\n"
+
+
+def _decode_text(part):
+    """Decode a text part's payload once, using its declared charset."""
+    raw = part.get_payload(decode=True)
+    if raw is None:
+        return ''
+    charset = part.get_content_charset() or 'utf-8'
+    try:
+        return raw.decode(charset, errors='replace')
+    except LookupError:
+        # Unknown charset name in the header
+        return raw.decode('utf-8', errors='replace')
+
+
+class LogQueue(queue.SimpleQueue):
+    """Queue that wakes the Tk event loop with a virtual event on put.
+
+    Built on SimpleQueue: the GUI only needs put/get_nowait, not the
+    task_done/join/maxsize bookkeeping of queue.Queue.
+
+    Only one event is outstanding at a time; the GUI re-arms it when it
+    starts draining, so a burst of messages costs a single wakeup.
+    """
+
+    def __init__(self, widget, event='<<LogAvailable>>'):
+        super().__init__()
+        self.widget = widget
+        self.event = event
+        self.notified = False
+
+    def put(self, item, block=True, timeout=None):
+        super().put(item, block, timeout)
+        if not self.notified:
+            self.notified = True
+            try:
+                self.widget.event_generate(self.event, when='tail')
+            except (tk.TclError, RuntimeError):
+                # Window already destroyed or main loop not running
+                pass
+
+
+class MailboxEventHandler(FileSystemEventHandler):
+    """Forward mailbox directory and index changes to the Tk thread."""
+
+    # 'opened'/'closed_no_write' fire on our own reads and must be ignored
+    EVENT_TYPES = ('created', 'modified', 'moved', 'deleted', 'closed')
+
+    def __init__(self, gui):
+        super().__init__()
+        self.gui = gui
+
+    def on_any_event(self, event):
+        if event.event_type not in self.EVENT_TYPES:
+            return
+        path = getattr(event, 'dest_path', '') or event.src_path
+        if event.is_directory or os.path.basename(path) == INDEX_FILE:
+            self.gui._call_on_tk(self.gui._on_mailbox_event, path)
 
 
 class SMTPLabGUI:
@@ -26,14 +128,40 @@ class SMTPLabGUI:
         # Server state
         self.server_controller = None
         self.server_running = False
-        self.server_thread = None
         
-        # Queue for server logs
-        self.log_queue = queue.Queue()
-        # current attachments for selected email (list of {'filename', 'data'})
+        # Queue for server logs; puts post <<LogAvailable>> to the Tk loop
+        self.log_queue = LogQueue(self.root)
+        # (widget, message, color) for log_message; safe to fill from threads
+        self._ui_queue = LogQueue(self.root, '<<UIUpdate>>')
+        # current attachments for selected email
+        # (list of {'filename', 'part_index', 'eml_path'})
         self.current_attachments = []
         # map tree item id -> eml filename for reliable lookup
         self.email_map = {}
+        # mailbox path -> (bytes of index.jsonl read, parsed metadata list)
+        self._meta_cache = {}
+        # mailbox name shown in the combobox <-> directory under mailboxes/
+        self._display_to_dir = {}
+        self._dir_to_display = {}
+        # failure json path -> ((st_mtime_ns, st_size), parsed list)
+        self._failures_cache = {}
+        # Delivery failures are virtualized: every row lives in
+        # _all_failures, but the tree only holds the visible window of
+        # them, starting at row _delivery_top
+        self._all_failures = []
+        self._delivery_slots = []
+        self._delivery_top = 0
+        self._delivery_page = 15
+        self._delivery_selected = None
+        # Single worker for mailbox disk I/O and email parsing, so the Tk
+        # loop never blocks on it (one worker also keeps _meta_cache safe)
+        self._io_pool = ThreadPoolExecutor(max_workers=1)
+        # Shared .eml parser; parse() keeps no state between calls
+        self._eml_parser = BytesParser(policy=policy.default)
+        # Mailbox directories touched since the last watchdog-driven sync
+        self._changed_dirs = set()
+        self._sync_pending = False
+        self._observer = None
         
         # Configure style
         style = ttk.Style()
@@ -49,8 +177,12 @@ class SMTPLabGUI:
         self.create_mailbox_tab()
         self.create_delivery_status_tab()
         
-        # Start log update loop
-        self.update_logs()
+        # Drain server logs whenever the queue signals new messages
+        self.root.bind('<<LogAvailable>>', self._drain_logs)
+        self.root.bind('<<UIUpdate>>', self._drain_ui)
+        
+        # Reload the mailbox view as mail is delivered
+        self.start_mailbox_watch()
         
         # Bind window close event
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -101,16 +233,24 @@ class SMTPLabGUI:
         self.server_log = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD, 
                                                      height=20, font=('Courier', 9))
         self.server_log.pack(fill=tk.BOTH, expand=True)
-        
-        # Add initial helpful message
-        self.server_log.insert(tk.END, "═" * 60 + "\n")
-        self.server_log.insert(tk.END, "SMTP Server Control Panel\n")
-        self.server_log.insert(tk.END, "═" * 60 + "\n\n")
-        self.server_log.insert(tk.END, "👉 Click 'Start Server' button above to begin receiving emails\n\n")
-        self.server_log.insert(tk.END, "Server will listen on the specified host and port.\n")
-        self.server_log.insert(tk.END, "Default: 127.0.0.1:1025 (localhost)\n\n")
-        self.server_log.insert(tk.END, "Logs will appear here when the server is running...\n")
-        self.server_log.insert(tk.END, "═" * 60 + "\n\n")
+        for color, fg in LOG_COLORS.items():
+            self.server_log.tag_config(color, foreground=fg)
+        
+        # Add initial helpful message (one insert, one layout pass)
+        self.server_log.insert(tk.END, "\n".join([
+            "═" * 60,
+            "SMTP Server Control Panel",
+            "═" * 60,
+            "",
+            "👉 Click 'Start Server' button above to begin receiving emails",
+            "",
+            "Server will listen on the specified host and port.",
+            "Default: 127.0.0.1:1025 (localhost)",
+            "",
+            "Logs will appear here when the server is running...",
+            "═" * 60,
+            "",
+        ]) + "\n")
         
         # Clear log button
         ttk.Button(log_frame, text="Clear Logs", 
@@ -201,6 +341,8 @@ class SMTPLabGUI:
         self.send_status = scrolledtext.ScrolledText(compose_frame, wrap=tk.WORD, 
                                                       height=6, width=60, font=('Courier', 9))
         self.send_status.grid(row=7, column=1, pady=5)
+        for color, fg in LOG_COLORS.items():
+            self.send_status.tag_config(color, foreground=fg)
     
     def create_mailbox_tab(self):
         """Create mailbox viewer tab"""
@@ -252,6 +394,7 @@ class SMTPLabGUI:
         self.email_content = scrolledtext.ScrolledText(content_frame, wrap=tk.WORD, 
                                                         height=15, font=('Arial', 10))
         self.email_content.pack(fill=tk.BOTH, expand=True)
+        self.email_content.tag_config('bold', font=('Arial', 10, 'bold'))
         # Attachments area: listbox + Save button
         attach_bottom = ttk.Frame(content_frame)
         attach_bottom.pack(fill=tk.X, pady=(6,0))
@@ -272,23 +415,16 @@ class SMTPLabGUI:
             host = self.server_host.get()
             port = int(self.server_port.get())
             
-            def run_server():
-                handler = CustomSMTPHandler()
-                # Redirect handler logs to GUI
-                handler.gui_log_queue = self.log_queue
-                
-                self.server_controller = Controller(handler, hostname=host, port=port)
-                self.server_controller.start()
-                
-                self.log_queue.put(f"✓ SMTP Server started on {host}:{port}\n")
-                
-                # Keep server running
-                while self.server_running:
-                    time.sleep(0.1)
+            handler = CustomSMTPHandler()
+            # Redirect handler logs to GUI
+            handler.gui_log_queue = self.log_queue
             
+            # Controller runs its own event loop thread; start() returns once it is serving
+            self.server_controller = Controller(handler, hostname=host, port=port)
+            self.server_controller.start()
             self.server_running = True
-            self.server_thread = threading.Thread(target=run_server, daemon=True)
-            self.server_thread.start()
+            
+            self.log_queue.put(f"✓ SMTP Server started on {host}:{port}\n")
             
             # Update UI
             self.start_btn.config(state=tk.DISABLED)
@@ -303,15 +439,34 @@ class SMTPLabGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start server: {str(e)}")
     
-    def stop_server(self):
-        """Stop SMTP server"""
-        try:
-            self.server_running = False
-            
-            if self.server_controller:
-                self.server_controller.stop()
-                self.server_controller = None
-            
+    def stop_server(self, on_stopped=None):
+        """Stop SMTP server; on_stopped runs on the Tk thread once it has"""
+        self.server_running = False
+        controller, self.server_controller = self.server_controller, None
+        self.stop_btn.config(state=tk.DISABLED)
+        
+        def stop_thread():
+            error = None
+            try:
+                if controller:
+                    controller.stop()
+            except Exception as e:
+                error = e
+            self._call_on_tk(self._server_stopped, controller, error, on_stopped)
+        
+        # Controller.stop() joins the server's loop thread, which may be
+        # waiting for this (Tk) thread to take a log event; stopping it
+        # from here could deadlock, so stop it on a helper thread
+        threading.Thread(target=stop_thread, daemon=True).start()
+    
+    def _server_stopped(self, controller, error, on_stopped=None):
+        """Finish stop_server once the controller has stopped (Tk thread)"""
+        if error is not None:
+            # Keep the controller so Stop can be retried
+            self.server_controller = controller
+            self.stop_btn.config(state=tk.NORMAL)
+            messagebox.showerror("Error", f"Failed to stop server: {str(error)}")
+        else:
             # Update UI
             self.start_btn.config(state=tk.NORMAL)
             self.stop_btn.config(state=tk.DISABLED)
@@ -321,9 +476,9 @@ class SMTPLabGUI:
             # Show warning in client tab
             if hasattr(self, 'client_warning'):
                 self.client_warning.grid()
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to stop server: {str(e)}")
+        
+        if on_stopped:
+            on_stopped()
     
     def send_email(self):
         """Send email using SMTP client"""
@@ -369,8 +524,9 @@ class SMTPLabGUI:
                         self.log_message(self.send_status, 
                                        f"✓ Email sent successfully!\n  From: {sender}\n  To: {', '.join(recipients)}\n  Subject: {subject}\n\n", 
                                        'green')
-                        # Auto-refresh mailbox
-                        self.root.after(1000, self.refresh_mailbox)
+                        # Auto-refresh mailbox (the watcher does this when active)
+                        if self._observer is None:
+                            self._call_on_tk(self.root.after, 1000, self.refresh_mailbox)
                     else:
                         self.log_message(self.send_status, 
                                        f"✗ Failed to send email.\n"
@@ -421,7 +577,14 @@ class SMTPLabGUI:
             if not save_path:
                 return
 
-            data = attach.get('data')
+            # Re-parse the .eml and decode just the selected part
+            try:
+                with open(attach['eml_path'], 'rb') as f:
+                    msg = self._eml_parser.parse(f)
+                parts = list(msg.iter_parts())
+                data = parts[attach['part_index']].get_payload(decode=True)
+            except (OSError, IndexError):
+                data = None
             if data is None:
                 # If no raw data, inform user
                 messagebox.showwarning("Save Attachment", "Attachment data unavailable.")
@@ -447,56 +610,200 @@ class SMTPLabGUI:
     
     def refresh_mailbox(self):
         """Refresh mailbox list"""
+        mailboxes = self._scan_mailboxes()
+        if mailboxes:
+            self.mailbox_combo.current(0)
+            self.load_emails()
+    
+    def _scan_mailboxes(self):
+        """Rebuild the mailbox name maps and combobox list"""
         mailbox_dir = 'mailboxes'
+        self._display_to_dir.clear()
+        self._dir_to_display.clear()
         if os.path.exists(mailbox_dir):
-            mailboxes = [d.replace('_at_', '@').replace('_', '.') 
-                        for d in os.listdir(mailbox_dir) 
-                        if os.path.isdir(os.path.join(mailbox_dir, d))]
-            self.mailbox_combo['values'] = mailboxes
-            if mailboxes:
+            # Map each shown name to its real directory, since the
+            # '_at_'/'_' encoding cannot be inverted reliably
+            for entry in os.scandir(mailbox_dir):
+                if entry.is_dir():
+                    display = entry.name.replace('_at_', '@').replace('_', '.')
+                    self._display_to_dir[display] = entry.name
+                    self._dir_to_display[entry.name] = display
+        mailboxes = list(self._display_to_dir)
+        self.mailbox_combo['values'] = mailboxes
+        return mailboxes
+    
+    def start_mailbox_watch(self):
+        """Watch mailboxes/ with watchdog, if it is installed"""
+        if Observer is None:
+            return
+        try:
+            os.makedirs('mailboxes', exist_ok=True)
+            observer = Observer()
+            observer.schedule(MailboxEventHandler(self), 'mailboxes', recursive=True)
+            observer.daemon = True
+            observer.start()
+        except Exception as e:
+            logging.warning(f"Mailbox watcher unavailable: {e}")
+            return
+        self._observer = observer
+    
+    def _on_mailbox_event(self, path):
+        """Note a changed mailbox and schedule one sync for the burst"""
+        top = os.path.relpath(path, 'mailboxes').split(os.sep)[0]
+        self._changed_dirs.add(top)
+        if not self._sync_pending:
+            self._sync_pending = True
+            # Short delay so the several events of one index append (and
+            # a burst of deliveries) cost a single sync
+            self.root.after(200, self._sync_mailboxes)
+    
+    def _sync_mailboxes(self):
+        """Apply watched changes: new mailboxes and the selected one's mail"""
+        self._sync_pending = False
+        changed, self._changed_dirs = self._changed_dirs, set()
+        
+        if any(name not in self._dir_to_display for name in changed):
+            mailboxes = self._scan_mailboxes()
+            if mailboxes and self.mailbox_var.get() not in self._display_to_dir:
                 self.mailbox_combo.current(0)
                 self.load_emails()
-        else:
-            self.mailbox_combo['values'] = []
+                return
+        
+        if self._display_to_dir.get(self.mailbox_var.get()) in changed:
+            self.load_new_emails()
     
     def load_emails(self, event=None):
         """Load emails for selected mailbox"""
         # Clear tree
-        for item in self.email_tree.get_children():
-            self.email_tree.delete(item)
+        self.email_tree.delete(*self.email_tree.get_children())
         
         mailbox = self.mailbox_var.get()
-        if not mailbox:
+        mailbox_safe = self._display_to_dir.get(mailbox)
+        if not mailbox_safe:
             return
         
-        mailbox_safe = mailbox.replace('@', '_at_').replace('.', '_')
         mailbox_path = os.path.join('mailboxes', mailbox_safe)
         
-        if not os.path.exists(mailbox_path):
+        # Read metadata on the I/O worker; fill the tree back on the Tk thread
+        future = self._io_pool.submit(self._read_mailbox, mailbox_path)
+        future.add_done_callback(
+            lambda f: self._call_on_tk(self._populate_tree, mailbox, f))
+    
+    def load_new_emails(self):
+        """Add rows for mail newly appended to the selected mailbox's index"""
+        mailbox = self.mailbox_var.get()
+        mailbox_safe = self._display_to_dir.get(mailbox)
+        if not mailbox_safe:
             return
         
-        # Load metadata files
-        emails = []
-        for file in os.listdir(mailbox_path):
-            if file.endswith('.json'):
-                with open(os.path.join(mailbox_path, file), 'r') as f:
-                    metadata = json.load(f)
-                    emails.append(metadata)
+        mailbox_path = os.path.join('mailboxes', mailbox_safe)
+        future = self._io_pool.submit(self._read_index_records, mailbox_path)
+        future.add_done_callback(
+            lambda f: self._call_on_tk(self._insert_new_emails, mailbox, f))
+    
+    def _read_index_records(self, mailbox_path):
+        """
+        Bring _meta_cache up to date with the mailbox index (worker thread).
+        
+        Returns:
+            tuple: (all index records, records appended since the last read);
+                   the second is None when the index had to be read afresh
+        """
+        # The index is append-only: keep what was already read and only
+        # parse the bytes added since, unless the file shrank (replaced)
+        cached = self._meta_cache.get(mailbox_path)
+        offset, records = cached or (0, [])
+        try:
+            size = os.stat(os.path.join(mailbox_path, INDEX_FILE)).st_size
+        except FileNotFoundError:
+            # read_index falls back to legacy metadata files
+            records, _ = read_index(mailbox_path)
+            return records, None
+        if size < offset:
+            cached, offset, records = None, 0, []
+        new_records = []
+        if size != offset:
+            new_records, offset = read_index(mailbox_path, offset)
+            records = records + new_records
+            self._meta_cache[mailbox_path] = (offset, records)
+        return records, (new_records if cached else None)
+    
+    def _read_mailbox(self, mailbox_path):
+        """Return the mailbox's metadata dicts, newest first (worker thread)"""
+        records, _ = self._read_index_records(mailbox_path)
+        
+        # .eml files the index does not name are still listed
+        emails = records + [{'filename': name}
+                            for name in find_unindexed(mailbox_path, records)]
         
         # Sort by timestamp (newest first)
-        emails.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        return sorted(emails, key=lambda x: x.get('timestamp', ''), reverse=True)
+    
+    @staticmethod
+    def _email_row(email):
+        """Tree values and filename for one metadata dict"""
+        return ((email.get('from', 'Unknown'),
+                 email.get('subject', 'No Subject'),
+                 email.get('timestamp', '')[:19]),
+                email.get('filename', ''))
+    
+    def _populate_tree(self, mailbox, future):
+        """Show emails read by _read_mailbox (Tk thread)"""
+        # Ignore results for a mailbox the user has already moved away from
+        if mailbox != self.mailbox_var.get():
+            return
+        try:
+            emails = future.result()
+        except Exception as e:
+            logging.error(f"Error loading mailbox {mailbox}: {str(e)}")
+            return
+        
+        # Format every row up front so the insert loop only talks to Tk
+        rows = [self._email_row(email) for email in emails]
+        
+        self.email_tree.delete(*self.email_tree.get_children())
         
         # Add to tree and store mapping from item id -> filename
         self.email_map.clear()
-        for i, email in enumerate(emails, 1):
-            item_id = self.email_tree.insert('', tk.END, text=str(i), 
-                                             values=(email.get('from', 'Unknown'),
-                                                    email.get('subject', 'No Subject'),
-                                                    email.get('timestamp', '')[:19]))
-            filename = email.get('filename', '')
+        insert = self.email_tree.insert
+        for i, (values, filename) in enumerate(rows, 1):
+            item_id = insert('', tk.END, text=str(i), values=values)
             if filename:
                 self.email_map[item_id] = filename
     
+    def _insert_new_emails(self, mailbox, future):
+        """Insert rows for newly indexed mail at the top of the tree (Tk thread)"""
+        if mailbox != self.mailbox_var.get():
+            return
+        try:
+            _, new_records = future.result()
+        except Exception as e:
+            logging.error(f"Error loading mailbox {mailbox}: {str(e)}")
+            return
+        if new_records is None:
+            # The index was replaced or is not built yet: reload it all
+            self.load_emails()
+            return
+        
+        # A row may already be shown for a file listed before it was indexed
+        shown = {filename: item_id for item_id, filename in self.email_map.items()}
+        insert = self.email_tree.insert
+        for email in sorted(new_records, key=lambda x: x.get('timestamp', '')):
+            values, filename = self._email_row(email)
+            old_item = shown.get(filename)
+            if old_item:
+                self.email_tree.delete(old_item)
+                del self.email_map[old_item]
+            item_id = insert('', 0, values=values)
+            if filename:
+                self.email_map[item_id] = filename
+        
+        # Newest is #1: renumber in place, without re-inserting any row
+        if new_records:
+            item = self.email_tree.item
+            for i, item_id in enumerate(self.email_tree.get_children(), 1):
+                item(item_id, text=str(i))
+    
     def view_email(self, event=None):
         """View selected email content"""
         selection = self.email_tree.selection()
@@ -509,105 +816,91 @@ class SMTPLabGUI:
         if not eml_filename:
             return
         
-        mailbox = self.mailbox_var.get()
-        mailbox_safe = mailbox.replace('@', '_at_').replace('.', '_')
+        mailbox_safe = self._display_to_dir.get(self.mailbox_var.get())
+        if not mailbox_safe:
+            return
         eml_path = os.path.join('mailboxes', mailbox_safe, eml_filename)
         
         if os.path.exists(eml_path):
-            try:
-                from email.parser import BytesParser
-                from email import policy
-
-                with open(eml_path, 'rb') as f:
-                    msg = BytesParser(policy=policy.default).parse(f)
-                
-                # Clear content
-                self.email_content.delete(1.0, tk.END)
-                
-                # Display headers
-                self.email_content.insert(tk.END, f"From: {msg.get('From', 'Unknown')}\n", 'bold')
-                self.email_content.insert(tk.END, f"To: {msg.get('To', 'Unknown')}\n", 'bold')
-                self.email_content.insert(tk.END, f"Subject: {msg.get('Subject', 'No Subject')}\n", 'bold')
-                self.email_content.insert(tk.END, f"Date: {msg.get('Date', 'Unknown')}\n", 'bold')
-                self.email_content.insert(tk.END, "\n" + "-"*60 + "\n\n")
-                
-                # Display body (prefer text/plain, fallback to text/html)
-                def _safe_decode(payload_bytes):
-                    if payload_bytes is None:
-                        return ''
-                    if isinstance(payload_bytes, bytes):
-                        try:
-                            return payload_bytes.decode('utf-8')
-                        except Exception:
-                            return payload_bytes.decode('utf-8', errors='replace')
-                    return str(payload_bytes)
-
-                body_text = None
-                html_text = None
-                attachments = []
-                # reset current attachments store
-                self.current_attachments = []
-
-                if msg.is_multipart():
-                    for part in msg.iter_parts():
-                        ctype = part.get_content_type()
-                        cdisp = part.get_content_disposition()
-                        fname = part.get_filename()
-
-                        if cdisp == 'attachment' or fname:
-                            # capture attachment bytes so GUI can save/open them
-                            try:
-                                data = part.get_payload(decode=True)
-                            except Exception:
-                                data = None
-                            fname_clean = fname or 'unnamed'
-                            attachments.append(fname_clean)
-                            self.current_attachments.append({'filename': fname_clean, 'data': data})
-                            continue
-
-                        if ctype == 'text/plain' and body_text is None:
-                            try:
-                                body_text = part.get_content()
-                            except Exception:
-                                body_text = _safe_decode(part.get_payload(decode=True))
-                            continue
-
-                        if ctype == 'text/html' and html_text is None:
-                            try:
-                                html_text = part.get_content()
-                            except Exception:
-                                html_text = _safe_decode(part.get_payload(decode=True))
-                else:
-                    ctype = msg.get_content_type()
-                    if ctype.startswith('text/'):
-                        try:
-                            body_text = msg.get_content()
-                        except Exception:
-                            body_text = _safe_decode(msg.get_payload(decode=True))
-
-                if body_text:
-                    self.email_content.insert(tk.END, body_text)
-                elif html_text:
-                    self.email_content.insert(tk.END, "[HTML content — raw]\n")
-                    self.email_content.insert(tk.END, html_text)
-                else:
-                    self.email_content.insert(tk.END, "[No text body found]\n")
+            # Parse on the I/O worker; render back on the Tk thread
+            future = self._io_pool.submit(self._parse_email, eml_path)
+            future.add_done_callback(
+                lambda f: self._call_on_tk(self._show_email, item_id, f))
+    
+    def _parse_email(self, eml_path):
+        """Parse an .eml file into display fields (worker thread)"""
+        with open(eml_path, 'rb') as f:
+            msg = self._eml_parser.parse(f)
+        
+        headers = (msg.get('From', 'Unknown'), msg.get('To', 'Unknown'),
+                   msg.get('Subject', 'No Subject'), msg.get('Date', 'Unknown'))
+        
+        # Extract body (prefer text/plain, fallback to text/html)
+        body_text = None
+        html_text = None
+        attachments = []
 
-                # Show attachments listbox (populate from self.current_attachments)
-                self.attach_listbox.delete(0, tk.END)
-                if self.current_attachments:
-                    for a in self.current_attachments:
-                        self.attach_listbox.insert(tk.END, a['filename'])
-                else:
-                    # show nothing
-                    pass
-                
-                # Configure tags
-                self.email_content.tag_config('bold', font=('Arial', 10, 'bold'))
-                
-            except Exception as e:
-                self.email_content.delete(1.0, tk.END)
-                self.email_content.insert(tk.END, f"Error reading email: {str(e)}")
+        if msg.is_multipart():
+            for i, part in enumerate(msg.iter_parts()):
+                ctype = part.get_content_type()
+                cdisp = part.get_content_disposition()
+                fname = part.get_filename()
+
+                if cdisp == 'attachment' or fname:
+                    # Only remember where the attachment lives; save_attachment
+                    # decodes it on demand so unsaved payloads never sit in memory
+                    attachments.append({'filename': fname or 'unnamed',
+                                        'part_index': i, 'eml_path': eml_path})
+                    continue
+
+                if ctype == 'text/plain' and body_text is None:
+                    body_text = _decode_text(part)
+                    continue
+
+                if ctype == 'text/html' and html_text is None:
+                    html_text = _decode_text(part)
+        else:
+            ctype = msg.get_content_type()
+            if ctype.startswith('text/'):
+                body_text = _decode_text(msg)
+        
+        return headers, body_text, html_text, attachments
+    
+    def _show_email(self, item_id, future):
+        """Render an email parsed by _parse_email (Tk thread)"""
+        # Ignore results for an email that is no longer selected
+        if item_id not in self.email_tree.selection():
+            return
+        
+        # Clear content
+        self.email_content.delete(1.0, tk.END)
+        
+        try:
+            headers, body_text, html_text, attachments = future.result()
+        except Exception as e:
+            self.email_content.insert(tk.END, f"Error reading email: {str(e)}")
+            return
+        
+        # Display headers
+        from_addr, to_addr, subject, date = headers
+        hdr = (f"From: {from_addr}\nTo: {to_addr}\n"
+               f"Subject: {subject}\nDate: {date}\n")
+        # Tk's insert takes text/tag pairs: bold headers + plain separator
+        self.email_content.insert(tk.END, hdr, 'bold', HEADER_SEPARATOR)
+        
+        if body_text:
+            self.email_content.insert(tk.END, body_text)
+        elif html_text:
+            self.email_content.insert(tk.END, "[HTML content — raw]\n")
+            self.email_content.insert(tk.END, html_text)
+        else:
+            self.email_content.insert(tk.END, "[No text body found]\n")
+
+        # Show attachments listbox (populate from self.current_attachments)
+        self.current_attachments = attachments
+        self.attach_listbox.delete(0, tk.END)
+        for a in self.current_attachments:
+            self.attach_listbox.insert(tk.END, a['filename'])
     
     def create_delivery_status_tab(self):
         """Create delivery status tab showing failed deliveries"""
@@ -649,11 +942,18 @@ class SMTPLabGUI:
         self.delivery_tree.heading('subject', text='Subject')
         self.delivery_tree.heading('reason', text='Reason')
         
-        # Add scrollbars
-        vsb = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.delivery_tree.yview)
+        # Add scrollbars; the vertical one scrolls _all_failures, not the tree
+        vsb = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self._delivery_yview)
         hsb = ttk.Scrollbar(tree_frame, orient=tk.HORIZONTAL, command=self.delivery_tree.xview)
+        self._delivery_vsb = vsb
         
-        self.delivery_tree.configure(yscroll=vsb.set, xscroll=hsb.set)
+        self.delivery_tree.configure(xscroll=hsb.set)
+        self.delivery_tree.bind('<Configure>', self._on_delivery_resize)
+        self.delivery_tree.bind('<<TreeviewSelect>>', self._on_delivery_select)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.delivery_tree.bind(sequence, self._on_delivery_wheel)
+        for sequence in ('<Up>', '<Down>', '<Prior>', '<Next>'):
+            self.delivery_tree.bind(sequence, self._on_delivery_key)
         
         # Grid layout for tree and scrollbars
         self.delivery_tree.grid(row=0, column=0, sticky='nsew')
@@ -672,42 +972,41 @@ class SMTPLabGUI:
     
     def refresh_delivery_status(self):
         """Refresh the delivery status from JSON files"""
-        # Clear existing items
-        for item in self.delivery_tree.get_children():
-            self.delivery_tree.delete(item)
-        
         all_failures = []
         
         # Load client-side failures
-        if os.path.exists('delivery_failures.json'):
-            try:
-                with open('delivery_failures.json', 'r') as f:
-                    all_failures.extend(json.load(f))
-            except Exception as e:
-                self.delivery_status_label.config(text=f"Error reading client failures: {str(e)}")
-                return
+        try:
+            all_failures.extend(self._read_failures('delivery_failures.json'))
+        except Exception as e:
+            self.delivery_status_label.config(text=f"Error reading client failures: {str(e)}")
+            return
         
-        # Load server-side failures
-        if os.path.exists('server_delivery_failures.json'):
-            try:
-                with open('server_delivery_failures.json', 'r') as f:
-                    all_failures.extend(json.load(f))
-            except Exception as e:
-                self.delivery_status_label.config(text=f"Error reading server failures: {str(e)}")
-                return
+        # Load server-side failures, including the JSON array kept by
+        # versions before the JSON Lines log
+        try:
+            all_failures.extend(self._read_failures('server_delivery_failures.json'))
+            all_failures.extend(self._read_failures('server_delivery_failures.jsonl'))
+        except Exception as e:
+            self.delivery_status_label.config(text=f"Error reading server failures: {str(e)}")
+            return
+        
+        # Keep every row as plain values; only the visible window is
+        # handed to the tree. Each row is paired with its sort key so the
+        # dicts are read once and the sort uses a C-level key
+        rows = [
+            (failure.get('timestamp', ''),
+             (failure.get('timestamp', 'Unknown')[:19],  # Format: YYYY-MM-DD HH:MM:SS
+              failure.get('sender', 'Unknown'),
+              ', '.join(failure.get('recipients', [])),
+              failure.get('subject', 'No Subject'),
+              failure.get('reason', 'Unknown error')))
+            for failure in all_failures]
         
         # Sort by timestamp (newest first)
-        all_failures.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-        
-        # Populate tree
-        for idx, failure in enumerate(all_failures):
-            timestamp = failure.get('timestamp', 'Unknown')[:19]  # Format: YYYY-MM-DD HH:MM:SS
-            sender = failure.get('sender', 'Unknown')
-            recipients = ', '.join(failure.get('recipients', []))
-            subject = failure.get('subject', 'No Subject')
-            reason = failure.get('reason', 'Unknown error')
-            
-            self.delivery_tree.insert('', 'end', values=(timestamp, sender, recipients, subject, reason))
+        rows.sort(key=itemgetter(0), reverse=True)
+        self._all_failures = [values for _, values in rows]
+        self._delivery_selected = None
+        self._render_delivery_window()
         
         # Update status label
         if all_failures:
@@ -715,14 +1014,125 @@ class SMTPLabGUI:
         else:
             self.delivery_status_label.config(text="No failed deliveries")
     
+    def _render_delivery_window(self):
+        """Show rows _delivery_top onwards in the tree's fixed set of slots"""
+        total = len(self._all_failures)
+        page = self._delivery_page
+        top = max(0, min(self._delivery_top, total - page))
+        self._delivery_top = top
+        rows = self._all_failures[top:top + page]
+        
+        # Grow or shrink the slot items to the number of visible rows
+        slots = self._delivery_slots
+        while len(slots) < len(rows):
+            slots.append(self.delivery_tree.insert('', 'end'))
+        if len(slots) > len(rows):
+            self.delivery_tree.delete(*slots[len(rows):])
+            del slots[len(rows):]
+        for iid, values in zip(slots, rows):
+            self.delivery_tree.item(iid, values=values)
+        
+        # Selection follows the row, not the slot it was shown in
+        sel = self._delivery_selected
+        if sel is not None and top <= sel < top + len(rows):
+            self.delivery_tree.selection_set(slots[sel - top])
+        else:
+            self.delivery_tree.selection_set(())
+        
+        if total:
+            self._delivery_vsb.set(top / total, (top + len(rows)) / total)
+        else:
+            self._delivery_vsb.set(0.0, 1.0)
+    
+    def _delivery_yview(self, *args):
+        """Scrollbar command: move the window over _all_failures"""
+        if args[0] == 'moveto':
+            self._delivery_top = int(float(args[1]) * len(self._all_failures))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self._delivery_page
+            self._delivery_top += step
+        self._render_delivery_window()
+    
+    def _on_delivery_wheel(self, event):
+        """Scroll the window three rows per wheel notch"""
+        up = event.num == 4 or getattr(event, 'delta', 0) > 0
+        self._delivery_top += -3 if up else 3
+        self._render_delivery_window()
+        return 'break'
+    
+    def _on_delivery_key(self, event):
+        """Move the selection by a row or a page, scrolling past the window edge"""
+        total = len(self._all_failures)
+        if not total:
+            return 'break'
+        page = self._delivery_page
+        step = {'Up': -1, 'Down': 1, 'Prior': -page, 'Next': page}[event.keysym]
+        sel = self._delivery_selected
+        if sel is None:
+            sel = self._delivery_top
+        else:
+            sel = max(0, min(sel + step, total - 1))
+        self._delivery_selected = sel
+        
+        # Scroll just far enough to keep the selected row in the window
+        if sel < self._delivery_top:
+            self._delivery_top = sel
+        elif sel >= self._delivery_top + page:
+            self._delivery_top = sel - page + 1
+        self._render_delivery_window()
+        self.delivery_tree.focus(self._delivery_slots[sel - self._delivery_top])
+        return 'break'
+    
+    def _on_delivery_resize(self, event):
+        """Match the number of slots to the rows that fit in the tree"""
+        row_height = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+        # One row's worth of height goes to the headings
+        page = max(1, event.height // row_height - 1)
+        if page != self._delivery_page:
+            self._delivery_page = page
+            self._render_delivery_window()
+    
+    def _on_delivery_select(self, event=None):
+        """Remember which row (not slot) the user selected"""
+        selected = self.delivery_tree.selection()
+        if selected and selected[0] in self._delivery_slots:
+            self._delivery_selected = self._delivery_top + self._delivery_slots.index(selected[0])
+    
+    def _read_failures(self, path):
+        """Return the parsed failure list, re-reading only if the file changed"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._failures_cache.pop(path, None)
+            return []
+        key = (st.st_mtime_ns, st.st_size)
+        cached = self._failures_cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+        if path.endswith('.jsonl'):
+            failures, _ = read_jsonl(path)
+        else:
+            with open(path, 'rb') as f:
+                if ijson is not None and st.st_size >= STREAM_JSON_BYTES:
+                    # Only one record is being built at a time; the raw
+                    # file never sits in memory next to the parsed list
+                    failures = list(ijson.items(f, 'item'))
+                else:
+                    failures = json_loads(f.read())
+        self._failures_cache[path] = (key, failures)
+        return failures
+    
     def clear_delivery_failures(self):
         """Clear all failed delivery logs"""
         if messagebox.askyesno("Confirm", "Clear all failed delivery records?"):
             try:
                 if os.path.exists('delivery_failures.json'):
                     os.remove('delivery_failures.json')
-                if os.path.exists('server_delivery_failures.json'):
-                    os.remove('server_delivery_failures.json')
+                for path in ('server_delivery_failures.json', 'server_delivery_failures.jsonl'):
+                    if os.path.exists(path):
+                        os.remove(path)
                 self.refresh_delivery_status()
                 messagebox.showinfo("Success", "All delivery failure records cleared")
             except Exception as e:
@@ -756,47 +1166,110 @@ class SMTPLabGUI:
         
         # Note: In a full implementation, you would store the original email body
         # and resend it. For now, we'll send a notification email.
-        if client.send_email(sender, recipients, f"[RETRY] {subject}", body):
+        def retry_thread():
+            try:
+                success = client.send_email(sender, recipients, f"[RETRY] {subject}", body)
+            except Exception as e:
+                logging.error(f"Retry failed: {str(e)}")
+                success = False
+            self._call_on_tk(self._retry_finished, success)
+        
+        # Send off the Tk thread: the in-process server's log events need
+        # this thread free while it handles the message
+        threading.Thread(target=retry_thread, daemon=True).start()
+    
+    def _retry_finished(self, success):
+        """Report the result of retry_failed_delivery (Tk thread)"""
+        if success:
             messagebox.showinfo("Success", "Email resent successfully. Check Delivery Status to confirm.")
             self.refresh_delivery_status()
         else:
             messagebox.showerror("Failed", "Failed to resend email. Check logs for details.")
     
-    def log_message(self, widget, message, color=None):
-        """Log message to text widget"""
-        widget.insert(tk.END, message)
-        if color:
-            # Color the last line
-            color_map = {
-                'blue': '#0066cc',
-                'green': '#008000',
-                'red': '#cc0000'
-            }
-            widget.tag_config(color, foreground=color_map.get(color, color))
-            start = widget.index(f"end-{len(message)}c")
-            widget.tag_add(color, start, tk.END)
-        widget.see(tk.END)
-    
-    def update_logs(self):
-        """Update server logs from queue"""
+    def _call_on_tk(self, callback, *args):
+        """Schedule callback on the Tk thread (callable from any thread)"""
         try:
-            while True:
-                message = self.log_queue.get_nowait()
-                self.log_message(self.server_log, message)
-        except queue.Empty:
+            self.root.after(0, callback, *args)
+        except (tk.TclError, RuntimeError):
+            # Window already destroyed or main loop not running
             pass
-        
-        # Schedule next update
-        self.root.after(100, self.update_logs)
+    
+    def log_message(self, widget, message, color=None):
+        """Queue a message for a text widget (callable from any thread)"""
+        self._ui_queue.put((widget, message, color))
+    
+    def _drain_ui(self, event=None):
+        """Write queued log_message calls, one insert per widget and color run"""
+        self._ui_queue.notified = False
+        runs = []
+        while True:
+            try:
+                widget, message, color = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            if runs and runs[-1][0] is widget and runs[-1][1] == color:
+                runs[-1][2].append(message)
+            else:
+                runs.append((widget, color, [message]))
+        
+        touched = []
+        for widget, color, messages in runs:
+            if color:
+                if color not in LOG_COLORS:
+                    # Raw Tk color name; LOG_COLORS tags are set up at creation
+                    widget.tag_config(color, foreground=color)
+                widget.insert(tk.END, "".join(messages), color)
+            else:
+                widget.insert(tk.END, "".join(messages))
+            if widget not in touched:
+                touched.append(widget)
+        for widget in touched:
+            widget.see(tk.END)
+    
+    def _drain_logs(self, event=None):
+        """Move queued server logs into the log widget, one insert per batch"""
+        # Re-arm before draining so a put racing with us still notifies
+        self.log_queue.notified = False
+        messages = []
+        for _ in range(LOG_DRAIN_BATCH):
+            try:
+                messages.append(self.log_queue.get_nowait())
+            except queue.Empty:
+                break
+        else:
+            # More may be queued; continue after Tk has redrawn this batch
+            self.root.after_idle(self._drain_logs)
+        if messages:
+            self.server_log.insert(tk.END, "".join(messages))
+            # Trim the oldest lines so a long-running server can't grow the
+            # widget without bound
+            lines = int(self.server_log.index('end-1c').split('.')[0])
+            if lines > LOG_MAX_LINES:
+                self.server_log.delete('1.0', f'{lines - LOG_MAX_LINES + 1}.0')
+            self.server_log.see(tk.END)
     
     def on_closing(self):
         """Handle window closing"""
         if self.server_running:
-            if messagebox.askokcancel("Quit", "Server is running. Stop server and quit?"):
-                self.stop_server()
-                self.root.destroy()
-        else:
-            self.root.destroy()
+            if not messagebox.askokcancel("Quit", "Server is running. Stop server and quit?"):
+                return
+            # Quit once the server has stopped
+            self.stop_server(on_stopped=self._close_window)
+            return
+        self._close_window()
+    
+    def _close_window(self):
+        """Release connections, watcher and workers, then destroy the window"""
+        SMTPClient.close_connections()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=1)
+        # Drop queued I/O jobs; their callbacks would target a destroyed root
+        try:
+            self._io_pool.shutdown(wait=False, cancel_futures=True)
+        except TypeError:  # cancel_futures needs Python 3.9+
+            self._io_pool.shutdown(wait=False)
+        self.root.destroy()
 
 
 def main():
@@ -4,14 +4,26 @@ This server listens for incoming emails and delivers them to recipient mailboxes
 """
 
 import os
+import re
 import json
+import time
 import logging
+from collections import OrderedDict
 from datetime import datetime
 from email.parser import Parser, BytesParser
 from email import policy
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from aiosmtpd.controller import Controller
 from aiosmtpd.smtp import SMTP as SMTPProtocol
+from mailbox_index import append_to_index, read_jsonl
+
+# orjson serializes JSON several times faster; fall back to the stdlib if absent
+try:
+    from orjson import dumps as json_dumps
+except ImportError:
+    def json_dumps(obj):
+        return json.dumps(obj).encode('utf-8')
 
 # Setup logging
 logging.basicConfig(
@@ -23,6 +35,25 @@ logging.basicConfig(
     ]
 )
 
+# Identical failures (same sender, recipients, subject and reason) are
+# logged once per window; at most FAILURE_DEDUP_MAX are remembered
+FAILURE_DEDUP_SECONDS = 60
+FAILURE_DEDUP_MAX = 1024
+
+# Single writer thread: failure lines are serialized and appended off the
+# SMTP event loop, in the order they were recorded. Module level, so
+# starting and stopping the server repeatedly does not add a thread each time
+_failure_writer = ThreadPoolExecutor(max_workers=1)
+
+# Characters of text/plain body kept in each mailbox index entry. Kept short:
+# every index read pays for it, and longer bodies are parsed from the .eml
+BODY_PREVIEW_CHARS = 256
+
+# The rules validate_email enforces, as one compiled pattern: a 1-64 char
+# local part before the last '@', then a domain containing a dot that
+# neither starts nor ends with one
+_EMAIL_RE = re.compile(r'(?s).{1,64}@(?!\.)[^@]*\.[^@]*(?<!\.)\Z')
+
 # Exception Classes for Error Handling
 class SMTPServerException(Exception):
     """Base exception for SMTP server errors"""
@@ -44,8 +75,15 @@ class CustomSMTPHandler:
     def __init__(self, mailbox_dir='mailboxes'):
         self.mailbox_dir = mailbox_dir
         self.gui_log_queue = None  # For GUI logging
+        # recipient address -> mailbox directory known to exist
+        self._mailbox_paths = {}
         self.failed_deliveries = []
-        self.delivery_failures_file = 'server_delivery_failures.json'
+        # Append-only JSON Lines: one failure per line
+        self.delivery_failures_file = 'server_delivery_failures.jsonl'
+        # JSON array written by earlier versions; still read, never written
+        self.legacy_failures_file = 'server_delivery_failures.json'
+        # failure fingerprint -> time.monotonic() when it was last logged
+        self._recent_failures = OrderedDict()
         
         # Load existing failed deliveries
         self._load_failed_deliveries()
@@ -59,12 +97,15 @@ class CustomSMTPHandler:
     def _load_failed_deliveries(self):
         """Load failed deliveries from JSON file on startup"""
         try:
-            if os.path.exists(self.delivery_failures_file):
-                with open(self.delivery_failures_file, 'r') as f:
+            self.failed_deliveries = []
+            if os.path.exists(self.legacy_failures_file):
+                with open(self.legacy_failures_file, 'r') as f:
                     self.failed_deliveries = json.load(f)
+            if os.path.exists(self.delivery_failures_file):
+                records, _ = read_jsonl(self.delivery_failures_file)
+                self.failed_deliveries.extend(records)
+            if self.failed_deliveries:
                 logging.info(f"Loaded {len(self.failed_deliveries)} failed deliveries from log")
-            else:
-                self.failed_deliveries = []
         except Exception as e:
             logging.error(f"Error loading failed deliveries: {str(e)}")
             self.failed_deliveries = []
@@ -72,23 +113,47 @@ class CustomSMTPHandler:
     def _save_failed_delivery(self, sender, recipients, subject, reason):
         """Save failed delivery info to log file"""
         try:
+            recipients = recipients if isinstance(recipients, list) else [recipients]
+            
+            # Skip a failure identical to one logged moments ago (retry storms)
+            fingerprint = (sender, tuple(recipients), subject, reason)
+            now = time.monotonic()
+            last = self._recent_failures.get(fingerprint)
+            if last is not None and now - last < FAILURE_DEDUP_SECONDS:
+                return
+            self._recent_failures[fingerprint] = now
+            self._recent_failures.move_to_end(fingerprint)
+            if len(self._recent_failures) > FAILURE_DEDUP_MAX:
+                self._recent_failures.popitem(last=False)
+            
             failure = {
                 'timestamp': datetime.now().isoformat(),
                 'sender': sender,
-                'recipients': recipients if isinstance(recipients, list) else [recipients],
+                'recipients': recipients,
                 'subject': subject,
                 'reason': reason
             }
             self.failed_deliveries.append(failure)
             
-            # Persist to JSON file
-            with open(self.delivery_failures_file, 'w') as f:
-                json.dump(self.failed_deliveries, f, indent=4)
+            # Hand the disk write to the writer thread
+            future = _failure_writer.submit(self._append_failure, failure)
+            future.add_done_callback(self._report_failure_write)
             
             logging.info(f"Failed delivery logged: {reason}")
         except Exception as e:
             logging.error(f"Error saving failed delivery: {str(e)}")
     
+    def _append_failure(self, failure):
+        """Append one failure as a JSON line (writer thread)"""
+        with open(self.delivery_failures_file, 'ab') as f:
+            f.write(json_dumps(failure) + b'\n')
+    
+    def _report_failure_write(self, future):
+        """Log a failure line that could not be written"""
+        e = future.exception()
+        if e is not None:
+            logging.error(f"Error saving failed delivery: {str(e)}")
+    
     async def handle_DATA(self, server, session, envelope):
         """
         Process incoming email messages with comprehensive error handling.
@@ -102,7 +167,10 @@ class CustomSMTPHandler:
             peer = session.peer
             mailfrom = envelope.mail_from
             rcpttos = envelope.rcpt_tos
+            # Encode once; parsing and every mailbox write share these bytes
             data = envelope.content
+            if not isinstance(data, bytes):
+                data = data.encode('utf-8')
             
             logging.info(f"Receiving email from: {peer}")
             logging.info(f"Sender: {mailfrom}")
@@ -113,7 +181,7 @@ class CustomSMTPHandler:
             
             # Parse the email data using BytesParser
             try:
-                msg = BytesParser(policy=policy.default).parsebytes(data if isinstance(data, bytes) else data.encode('utf-8'))
+                msg = BytesParser(policy=policy.default).parsebytes(data)
             except Exception as e:
                 self.logger.error(f"Error parsing email: {str(e)}")
                 self._save_failed_delivery(mailfrom, rcpttos, "Unknown", f"Email parsing error: {str(e)}")
@@ -138,6 +206,10 @@ class CustomSMTPHandler:
                 self._save_failed_delivery(mailfrom, rcpttos, subject, error_msg)
                 return '550 Invalid sender address'
             
+            # Body preview and attachment names for the mailbox index,
+            # extracted once for all recipients
+            summary = self.summarize_message(msg)
+            
             # Deliver email to each recipient's mailbox
             failed_recipients = []
             for recipient in rcpttos:
@@ -145,8 +217,10 @@ class CustomSMTPHandler:
                     # Validate recipient
                     self.validate_email(recipient)
                     
-                    # Deliver to mailbox
-                    self.deliver_to_mailbox(recipient, mailfrom, subject, data, msg)
+                    # Deliver to mailbox on a worker thread so the disk
+                    # writes don't stall the SMTP event loop
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, self.deliver_to_mailbox, recipient, mailfrom, subject, data, msg, summary)
                     logging.info(f"Email delivered to {recipient}")
                     self._gui_log(f"✓ Email delivered to {recipient}\n")
                     
@@ -199,6 +273,11 @@ class CustomSMTPHandler:
         Raises:
             InvalidRecipient: If email is invalid
         """
+        # Fast path: one C-level match for valid addresses; the checks
+        # below only run to explain a rejection
+        if isinstance(email, str) and _EMAIL_RE.match(email.strip()):
+            return True
+        
         if not email or not isinstance(email, str):
             raise InvalidRecipient(f"Email must be a non-empty string, got {type(email)}")
         
@@ -220,7 +299,40 @@ class CustomSMTPHandler:
         
         return True
     
-    def deliver_to_mailbox(self, recipient, sender, subject, raw_data, parsed_msg):
+    def summarize_message(self, parsed_msg):
+        """
+        Extract the parts of a message that mailbox viewers show first.
+        
+        Args:
+            parsed_msg: Parsed email message object
+            
+        Returns:
+            dict: 'body_preview' (start of the text/plain body, or None if
+                  there is none), 'body_truncated' and 'attachments' (names)
+        """
+        body = None
+        attachments = []
+        parts = parsed_msg.iter_parts() if parsed_msg.is_multipart() else [parsed_msg]
+        for part in parts:
+            filename = part.get_filename()
+            if part.get_content_disposition() == 'attachment' or filename:
+                attachments.append(filename or 'unnamed')
+                continue
+            if body is None and part.get_content_type() == 'text/plain':
+                raw = part.get_payload(decode=True) or b''
+                charset = part.get_content_charset() or 'utf-8'
+                try:
+                    body = raw.decode(charset, errors='replace')
+                except LookupError:
+                    body = raw.decode('utf-8', errors='replace')
+        
+        return {
+            'body_preview': body[:BODY_PREVIEW_CHARS] if body is not None else None,
+            'body_truncated': body is not None and len(body) > BODY_PREVIEW_CHARS,
+            'attachments': attachments
+        }
+    
+    def deliver_to_mailbox(self, recipient, sender, subject, raw_data, parsed_msg, summary=None):
         """
         Deliver email to recipient's mailbox with comprehensive error handling.
         
@@ -228,23 +340,26 @@ class CustomSMTPHandler:
             recipient: Recipient email address
             sender: Sender email address
             subject: Email subject
-            raw_data: Raw email data
+            raw_data: Raw email data (bytes)
             parsed_msg: Parsed email message object
+            summary: summarize_message() result (computed here if omitted)
             
         Raises:
             DeliveryFailure: If delivery to mailbox fails
         """
         try:
-            # Create recipient mailbox if it doesn't exist
-            recipient_safe = recipient.replace('@', '_at_').replace('.', '_')
-            recipient_mailbox = os.path.join(self.mailbox_dir, recipient_safe)
-            
-            # Create directory with error handling
-            try:
-                if not os.path.exists(recipient_mailbox):
-                    os.makedirs(recipient_mailbox)
-            except OSError as e:
-                raise DeliveryFailure(f"Failed to create mailbox directory {recipient_mailbox}: {str(e)}")
+            # Create recipient mailbox the first time we deliver to it
+            recipient_mailbox = self._mailbox_paths.get(recipient)
+            if recipient_mailbox is None:
+                recipient_safe = recipient.replace('@', '_at_').replace('.', '_')
+                recipient_mailbox = os.path.join(self.mailbox_dir, recipient_safe)
+                
+                # Create directory with error handling
+                try:
+                    os.makedirs(recipient_mailbox, exist_ok=True)
+                except OSError as e:
+                    raise DeliveryFailure(f"Failed to create mailbox directory {recipient_mailbox}: {str(e)}")
+                self._mailbox_paths[recipient] = recipient_mailbox
             
             # Generate unique filename for email
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
@@ -254,11 +369,13 @@ class CustomSMTPHandler:
             # Save raw email data with error handling
             try:
                 with open(email_path, 'wb') as f:
-                    f.write(raw_data if isinstance(raw_data, bytes) else raw_data.encode('utf-8'))
+                    f.write(raw_data)
             except IOError as e:
+                # The directory may have been removed; recreate it next time
+                self._mailbox_paths.pop(recipient, None)
                 raise DeliveryFailure(f"Failed to write email file {email_path}: {str(e)}")
             
-            # Save email metadata with error handling
+            # Append email metadata to the mailbox index with error handling
             try:
                 metadata = {
                     'timestamp': datetime.now().isoformat(),
@@ -267,12 +384,10 @@ class CustomSMTPHandler:
                     'subject': subject,
                     'filename': email_filename
                 }
-                
-                metadata_path = os.path.join(recipient_mailbox, f"metadata_{timestamp}.json")
-                with open(metadata_path, 'w') as f:
-                    json.dump(metadata, f, indent=4)
-            except (IOError, json.JSONDecodeError) as e:
-                raise DeliveryFailure(f"Failed to write metadata file: {str(e)}")
+                metadata.update(summary or self.summarize_message(parsed_msg))
+                append_to_index(recipient_mailbox, metadata)
+            except (IOError, ValueError) as e:
+                raise DeliveryFailure(f"Failed to update mailbox index: {str(e)}")
             
             logging.info(f"Email saved to: {email_path}")
             
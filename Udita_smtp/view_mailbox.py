@@ -4,10 +4,12 @@ View received emails in the mailboxes directory.
 """
 
 import os
-import json
 from email import policy
 from email.parser import BytesParser
 from datetime import datetime
+from functools import lru_cache
+
+from mailbox_index import INDEX_FILE, find_unindexed, read_index
 
 
 def list_mailboxes(mailbox_dir='mailboxes'):
@@ -16,40 +18,58 @@ def list_mailboxes(mailbox_dir='mailboxes'):
         print(f"No mailboxes directory found at: {mailbox_dir}")
         return []
     
-    mailboxes = [d for d in os.listdir(mailbox_dir) 
-                 if os.path.isdir(os.path.join(mailbox_dir, d))]
-    return mailboxes
+    # Adding or removing a mailbox changes the directory's mtime
+    return list(_list_mailboxes_cached(mailbox_dir, os.stat(mailbox_dir).st_mtime_ns))
+
+
+@lru_cache(maxsize=8)
+def _list_mailboxes_cached(mailbox_dir, mtime_ns):
+    """List mailboxes; mtime_ns only keys the cache."""
+    # DirEntry.is_dir() uses the type from readdir, no stat per entry
+    with os.scandir(mailbox_dir) as it:
+        return tuple(entry.name for entry in it if entry.is_dir())
 
 
 def get_emails_in_mailbox(mailbox_dir, mailbox_name):
     """Get all emails in a specific mailbox."""
     mailbox_path = os.path.join(mailbox_dir, mailbox_name)
+    # A delivery appends to the index, changing its mtime and size; a new
+    # .eml (indexed or not) changes the directory's mtime
+    stamp = (os.stat(mailbox_path).st_mtime_ns,)
+    try:
+        st = os.stat(os.path.join(mailbox_path, INDEX_FILE))
+        stamp += (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        pass
+    return list(_get_emails_cached(mailbox_path, stamp))
+
+
+@lru_cache(maxsize=64)
+def _get_emails_cached(mailbox_path, stamp):
+    """Read a mailbox's emails; stamp only keys the cache."""
     emails = []
     
-    # Get all .eml files
-    eml_files = [f for f in os.listdir(mailbox_path) if f.endswith('.eml')]
-    
-    for eml_file in eml_files:
-        eml_path = os.path.join(mailbox_path, eml_file)
-        
-        # Try to find corresponding metadata
-        metadata_file = eml_file.replace('email_', 'metadata_').replace('.eml', '.json')
-        metadata_path = os.path.join(mailbox_path, metadata_file)
-        
-        metadata = None
-        if os.path.exists(metadata_path):
-            with open(metadata_path, 'r') as f:
-                metadata = json.load(f)
-        
+    # One sequential read of the mailbox index
+    records, _ = read_index(mailbox_path)
+    for metadata in records:
+        eml_file = metadata.get('filename', '')
         emails.append({
             'eml_file': eml_file,
-            'eml_path': eml_path,
+            'eml_path': os.path.join(mailbox_path, eml_file),
             'metadata': metadata
         })
     
+    # .eml files the index does not name are listed without metadata
+    for eml_file in find_unindexed(mailbox_path, records):
+        emails.append({
+            'eml_file': eml_file,
+            'eml_path': os.path.join(mailbox_path, eml_file),
+            'metadata': None
+        })
+    
     # Sort by filename (which includes timestamp)
     emails.sort(key=lambda x: x['eml_file'], reverse=True)
-    return emails
+    return tuple(emails)
 
 
 def display_email(email_data):
@@ -67,6 +87,14 @@ def display_email(email_data):
     
     print("-"*70)
 
+    # Delivery stored the text body and attachment names in the index; only
+    # parse the .eml when that preview is missing or was cut short
+    if metadata and metadata.get('body_preview') and not metadata.get('body_truncated'):
+        print(metadata['body_preview'])
+        _print_attachments(metadata.get('attachments', []))
+        print("="*70)
+        return
+
     # Read and parse the email
     try:
         with open(eml_path, 'rb') as f:
@@ -132,11 +160,7 @@ def display_email(email_data):
             print("[No text body found]")
 
         # Show attachments if any
-        if attachments:
-            print("\n" + "-"*70)
-            print(f"Attachments ({len(attachments)}):")
-            for att in attachments:
-                print(f"  📎 {att['filename']}")
+        _print_attachments([att['filename'] for att in attachments])
 
     except Exception as e:
         print(f"Error reading email: {str(e)}")
@@ -144,6 +168,15 @@ def display_email(email_data):
     print("="*70)
 
 
+def _print_attachments(names):
+    """Print the attachment list, if any."""
+    if names:
+        print("\n" + "-"*70)
+        print(f"Attachments ({len(names)}):")
+        for name in names:
+            print(f"  📎 {name}")
+
+
 def main():
     print("\n" + "="*70)
     print("MAILBOX VIEWER")